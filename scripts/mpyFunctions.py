@@ -13,7 +13,7 @@ def __pico_is_file(file_path):
         return False 
 """
 def CALL_IS_FILE(file_path: str) -> str:
-    return f"__pico_is_file('{file_path}')"
+    return f"__pico_is_file({file_path!r})"
 DEL_IS_FILE = "del __pico_is_file"
 
 
@@ -27,36 +27,35 @@ def __pico_is_dir(file_path):
         return False
 """
 def CALL_IS_DIR(file_path: str) -> str:
-    return f"__pico_is_dir('{file_path}')"
+    return f"__pico_is_dir({file_path!r})"
 DEL_IS_DIR = "del __pico_is_dir"
 
 
 # no need to try expect as wrapper will handle this and return ERR const
 FC_GET_FILE_INFO = """\
 import uos
+import ujson
 def __pico_get_file_info(file_path):
     stat = uos.stat(file_path)
-    creation_time = stat[9]
-    modification_time = stat[8]
-    size = stat[6]
-    print('{"creation_time": ' + str(creation_time) + ', "modification_time": ' + str(modification_time) + ', "size": ' + str(size) + ', "is_dir": ' + str((stat[0] & 0o170000) == 0o040000).lower() + '}')
+    print(ujson.dumps({"creation_time": stat[9], "modification_time": stat[8], "size": stat[6], "is_dir": (stat[0] & 0o170000) == 0o040000}))
 """
 def CALL_GET_FILE_INFO(file_path: str) -> str:
-    return f"__pico_get_file_info('{file_path}')"
+    return f"__pico_get_file_info({file_path!r})"
 DEL_GET_FILE_INFO = "del __pico_get_file_info"
 
 
 FC_RENAME_ITEM = """\
 import uos
+import ujson
 def __pico_rename_file(old_name, new_name):
     try:
         uos.rename(old_name, new_name)
         print('{"success": true}')
     except OSError as e:
-        print('{"success": false, "error": "' + str(e) + '"}')
+        print(ujson.dumps({"success": False, "error": str(e)}))
 """
 def CALL_RENAME_ITEM(old_name: str, new_name: str) -> str:
-    return f"__pico_rename_file('{old_name}', '{new_name}')"
+    return f"__pico_rename_file({old_name!r}, {new_name!r})"
 DEL_RENAME_ITEM = "del __pico_rename_file"
 
 
@@ -86,14 +85,121 @@ def __pico_hash_file(file):
         with open(file, 'rb') as f:
             h = uhashlib.sha256()
             while True:
-                data = f.read(512)
+                data = f.read(4096)
                 if not data:
                     break
                 h.update(data)
             print(ujson.dumps({"file": file, "hash": ubinascii.hexlify(h.digest()).decode()}))
     except Exception as e:
-        print(ujson.dumps({"file": file, "error": f"{e.__class__.__name__}: {e}"}))
+        print(ujson.dumps({"file": file, "error": e.__class__.__name__ + ": " + str(e)}))
 """
 def CALL_HASH_FILE(file: str) -> str:
-    return f"__pico_hash_file('{file}')"
+    return f"__pico_hash_file({file!r})"
+def CALL_HASH_FILES(files: list[str]) -> str:
+    # iterate on the device so all hashes are calculated in one raw REPL transaction
+    return f"for __pico_f in {files!r}:\n    __pico_hash_file(__pico_f)\ndel __pico_f"
 DEL_HASH_FILE = "del __pico_hash_file"
+
+
+# walks the tree with an explicit stack of ilistdir iterators as recursion is expensive
+# in MicroPython, prints only files in the same format and pre-order as pyboard's fs_ls_recursive
+FC_LS_RECURSIVE = """\
+import uos
+def __pico_ls_recursive(src):
+    src = src or '/'
+    try:
+        stack = [(src if src[-1] == '/' else src + '/', uos.ilistdir(src))]
+        while stack:
+            prefix, entries = stack[-1]
+            for f in entries:
+                path = prefix + f[0]
+                if f[1] & 0x4000:
+                    # descend first, the rest of this folder follows after the subfolder
+                    stack.append((path + '/', uos.ilistdir(path)))
+                    break
+                print('{:12} {}'.format(f[3] if len(f) > 3 else 0, path))
+            else:
+                stack.pop()
+    except OSError as e:
+        print('!!ERR!! - ' + src + ': ' + str(e))
+"""
+def CALL_LS_RECURSIVE(folder: str) -> str:
+    return f"__pico_ls_recursive({folder!r})"
+
+
+# batch helpers so a list of paths is processed in one raw REPL transaction;
+# errors are printed with the same !!ERR!! prefix pyboard.filesystem_command uses
+FC_RM_FILES = """\
+import uos
+def __pico_rm_files(files):
+    for f in files:
+        try:
+            uos.remove(f)
+        except OSError as e:
+            print('!!ERR!! - ' + f + ': ' + str(e))
+"""
+def CALL_RM_FILES(files: list[str]) -> str:
+    return f"__pico_rm_files({files!r})"
+
+
+# existing folders are ignored like with the modified pyboard fs_mkdir
+FC_MKDIRS = """\
+import uos
+def __pico_mkdirs(folders):
+    for f in folders:
+        try:
+            uos.mkdir(f)
+        except OSError:
+            pass
+"""
+def CALL_MKDIRS(folders: list[str]) -> str:
+    return f"__pico_mkdirs({folders!r})"
+
+
+FC_RMDIRS = """\
+import uos
+def __pico_rmdirs(folders):
+    for f in folders:
+        try:
+            uos.rmdir(f)
+        except OSError as e:
+            print('!!ERR!! - ' + f + ': ' + str(e))
+"""
+def CALL_RMDIRS(folders: list[str]) -> str:
+    return f"__pico_rmdirs({folders!r})"
+
+
+# stat, then remove the file or (recursively) the folder in one go
+FC_RM_ITEM = """\
+import uos
+def __pico_rm_tree(target):
+    # ilistdir already yields the type, no extra stat per entry
+    for entry in uos.ilistdir(target):
+        current = target.rstrip('/') + '/' + entry[0]
+        if entry[1] == 0x4000:
+            __pico_rm_tree(current)
+        else:
+            uos.remove(current)
+    # required for security reasons
+    if target != '/':
+        uos.rmdir(target)
+def __pico_rm_item(path, recursive):
+    try:
+        if uos.stat(path)[0] & 0o170000 != 0o040000:
+            uos.remove(path)
+        elif recursive:
+            __pico_rm_tree(path)
+        else:
+            uos.rmdir(path)
+    except OSError as e:
+        print('!!ERR!! - ' + path + ': ' + str(e))
+"""
+def CALL_RM_ITEM(path: str, recursive: bool) -> str:
+    return f"__pico_rm_item({path!r}, {recursive!r})"
+
+
+# all helpers above in one blob so they can be loaded into the REPL's globals once
+# instead of being re-sent and compiled on every call
+FC_HELPER_SOURCES = (FC_GET_FILE_INFO, FC_RENAME_ITEM, FC_HASH_FILE, FC_LS_RECURSIVE,
+                     FC_RM_FILES, FC_MKDIRS, FC_RMDIRS, FC_RM_ITEM)
+FC_HELPERS = "".join(FC_HELPER_SOURCES)
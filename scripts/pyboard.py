@@ -626,16 +626,26 @@ class Pyboard:
                 progress_callback(written, src_size)
         self.exec_("fr.close()\nfw.close()")
 
-    def fs_get(self, src, dest, chunk_size=256, progress_callback=None):
+    # EDITED by paulober | chunk_size 1024 instead of 256 for fs_get/fs_put,
+    # each chunk is a full raw-paste round trip so fewer, larger chunks transfer faster
+    def fs_get(self, src, dest, chunk_size=1024, progress_callback=None):
         if progress_callback:
             src_size = self.fs_stat(src).st_size
             written = 0
-        self.exec_("f=open('%s','rb')\nr=f.read" % src)
-        with open(dest, "wb") as f:
+        ######################
+        # EDITED by paulober #
+        ######################
+        # open is sent with the first read and the device closes the file itself
+        # after the last (empty) read, saves two round trips per file
+        cmd = "f=open(%r,'rb')\nr=f.read\n" % src
+        # the local file is only opened (and truncated) once the remote file could be read
+        f = None
+        try:
             while True:
                 data = bytearray()
-                self.exec_("print(r(%u))" % chunk_size,
+                self.exec_(cmd + "d=r(%u)\nprint(d)\nif not d:\n f.close()" % chunk_size,
                            data_consumer=lambda d: data.extend(d))
+                cmd = ""
                 assert data.endswith(b"\r\n\x04")
                 try:
                     data = ast.literal_eval(str(data[:-3], "ascii"))
@@ -644,32 +654,53 @@ class Pyboard:
                 except (UnicodeError, ValueError) as e:
                     raise PyboardError(
                         "fs_get: Could not interpret received data: %s" % str(e))
+                if f is None:
+                    f = open(dest, "wb")
                 if not data:
                     break
                 f.write(data)
                 if progress_callback:
                     written += len(data)
                     progress_callback(written, src_size)
-        self.exec_("f.close()")
-
-    def fs_put(self, src, dest, chunk_size=256, progress_callback=None):
+        finally:
+            if f is not None:
+                f.close()
+        ######################
+        # END of edited part #
+        ######################
+
+    def fs_put(self, src, dest, chunk_size=1024, progress_callback=None):
         if progress_callback:
             src_size = os.path.getsize(src)
             written = 0
-        self.exec_("f=open('%s','wb')\nw=f.write" % dest)
+        ######################
+        # EDITED by paulober #
+        ######################
+        # open and close are sent together with the first and the last chunk,
+        # so a file smaller than chunk_size only needs a single round trip
+        cmd = "f=open(%r,'wb')\nw=f.write\n" % dest
         with open(src, "rb") as f:
+            data = f.read(chunk_size)
             while True:
-                data = f.read(chunk_size)
-                if not data:
-                    break
-                if sys.version_info < (3,):
-                    self.exec_("w(b" + repr(data) + ")")
-                else:
-                    self.exec_("w(" + repr(data) + ")")
-                if progress_callback:
+                next_data = f.read(chunk_size) if data else b""
+                if data:
+                    if sys.version_info < (3,):
+                        cmd += "w(b" + repr(data) + ")\n"
+                    else:
+                        cmd += "w(" + repr(data) + ")\n"
+                if not next_data:
+                    cmd += "f.close()"
+                self.exec_(cmd)
+                if progress_callback and data:
                     written += len(data)
                     progress_callback(written, src_size)
-        self.exec_("f.close()")
+                if not next_data:
+                    break
+                data = next_data
+                cmd = ""
+        ######################
+        # END of edited part #
+        ######################
 
     def fs_mkdir(self, dir):
         # Modified by paulober | added True for silent_fail parameter
@@ -1,30 +1,52 @@
-from pathlib import Path
 import os
 import ast
+from functools import lru_cache
 
 
 def create_folder_structure(file_paths: list[str], local_folder_path: str):
-    for file_path in file_paths:
-        Path(os.path.join(local_folder_path, file_path.lstrip(':').lstrip('/'))).parent.mkdir(parents=True, exist_ok=True)
+    # many files share a parent, so only create each unique parent once
+    parents = {os.path.dirname(os.path.join(local_folder_path, file_path.lstrip(':/')))
+               for file_path in file_paths}
+    for parent in parents:
+        os.makedirs(parent, exist_ok=True)
 
 
 # allow to run expression statements in raw repl mode
 
+# shared by all wrapped expressions, the tree is only unparsed so the node is never mutated
+PRINT_NAME = ast.Name(id='print', ctx=ast.Load())
+
+
 class PrintWrapper(ast.NodeTransformer):
+    def __init__(self):
+        # tracks if any node was wrapped so unparse can be skipped otherwise
+        self.changed = False
+
     def visit_Expr(self, node):
         if not (isinstance(node.value, ast.Call) and isinstance(node.value.func, ast.Name) and node.value.func.id == "print"):
             new_node = ast.Expr(value=ast.Call(
-                func=ast.Name(id='print', ctx=ast.Load()),
+                func=PRINT_NAME,
                 args=[node.value],
                 keywords=[]
             ))
+            self.changed = True
             return new_node
         return node
 
+# stateless apart from the changed flag which is reset on every call
+PRINT_WRAPPER = PrintWrapper()
+
+
+# the IDE often re-sends the same code (e.g. setup cells), so skip the reparse for those
+@lru_cache(maxsize=64)
 def wrap_expressions_with_print(code):
     try:
         tree = ast.parse(code)
-        wrapped_tree = PrintWrapper().visit(tree)
+        PRINT_WRAPPER.changed = False
+        wrapped_tree = PRINT_WRAPPER.visit(tree)
+        if not PRINT_WRAPPER.changed:
+            # nothing to wrap, keep the code as the user wrote it
+            return code
         wrapped_code = ast.unparse(wrapped_tree)
         return wrapped_code
     except Exception:
@@ -41,11 +63,11 @@ def prepend_parent_directories(folders: list[str]) -> list[str]:
     """
     parent_dirs = set()  # Use a set to avoid duplicates
     for folder in folders:
-        components = folder.split("/")
-        path = ""
-        for component in components:
-            if component:
-                path += "/" + component.lstrip("/")
-                parent_dirs.add(path)
+        # normalize to a single leading slash and no empty components
+        path = "/" + "/".join(component for component in folder.split("/") if component)
+        # walk up the parents; stop early as the parents of a known path are known too
+        while path != "/" and path not in parent_dirs:
+            parent_dirs.add(path)
+            path = path.rpartition("/")[0] or "/"
     sorted_dirs = sorted(parent_dirs)
     return sorted_dirs
@@ -1,28 +1,31 @@
 from collections import defaultdict
 import os
 import sys
-import json
 import pyboard as pyboard
 import mpyFunctions
-import ast
 from utils import create_folder_structure, wrap_expressions_with_print, prepend_parent_directories
 import threading
 import time
 import signal
-import platform
 from datetime import datetime
 from typing import Optional, Union
 
 EOO = "!!EOO!!"  # End of operation
 ERR = "!!ERR!!"  # Error
 SIMPLE_AUTO_COMP = "!!SIMPLE_AUTO_COMP!!"  # Simple auto completion
-SUPPORTED_USB_PIDS: list[int] = [
+# pre-encoded for writing directly into sys.stdout.buffer
+EOO_BYTES = (EOO + "\n").encode("utf-8")
+ERR_BYTES = (ERR + "\n").encode("utf-8")
+SIMPLE_AUTO_COMP_BYTES = SIMPLE_AUTO_COMP.encode("utf-8")
+UNKNOWN_COMMAND_BYTES = b"!!Unknown command!!\n"
+JSON_DECODE_ERROR_BYTES = b"!!JSONDecodeError!!\n"
+SUPPORTED_USB_PIDS: frozenset[int] = frozenset((
     0x0005,  # Raspberry Pi Pico MicroPython firmware (CDC)
-]
+))
 
 try:
     # could use IOExcpetion but it checks if the serial module is installed
-    from serial import SerialException
+    from serial import Serial, SerialException
     from serial.tools import list_ports
 except ImportError:
     print("!!ImportError!!")
@@ -46,25 +49,18 @@ def sanitize_remote(file: Optional[str]) -> str:
     Returns:
         str: The sanitized remote path.
     """
-    if file[0] != ":":
-        return ":" + file
-    elif file == "" or file == None:
+    if not file:
         return ":"  # root
+    elif not file.startswith(":"):
+        return ":" + file
     return file
 
 
 # this is a bit faster for a list of many files instead of calling sanitize_remote for each file
 # ensure to reflect changes also to sanitize_remote
 def sanitize_remote_v2(files: list[Optional[str]]) -> list[str]:
-    result = []
-    for file in files:
-        if file == "" or file == None:
-            result.append(":")  # root
-        elif file[0] != ":":
-            result.append(":" + file)
-        else:
-            result.append(file)
-    return result
+    # "not file" covers "" and None (root)
+    return [":" if not file else (file if file.startswith(":") else ":" + file) for file in files]
 
 
 def find_pico_ports():
@@ -76,24 +72,28 @@ def find_pico_ports():
     0x2E8A is the vendor ID for Raspberry Pi
     """
     # TODO: maybe return more like the name or description of the device
+    # enumerate only once, the fallback below reuses the same list
+    devs = list_ports.comports()
     try:
-        return [port.device for port in list_ports.comports() if port.pid in SUPPORTED_USB_PIDS and port.vid == 0x2E8A]
+        return [port.device for port in devs if port.pid in SUPPORTED_USB_PIDS and port.vid == 0x2E8A]
     except Exception:
-        devs = list_ports.comports()
         if len(devs) > 0:
             return [devs[0].device]
         return []
 
 
-def get_directories_to_create(file_paths):
-    for file_path in file_paths:
-        dir = os.path.dirname(file_path)
-        yield (file_path, dir)
+def remote_path(path: str) -> str:
+    """Converts a path into the form the remote device uses (like pyboard.filesystem_command does)."""
+    if path[:1] == ":":
+        path = path[1:]
+    return path.replace(os.path.sep, "/")
 
 
 fsop_current_file_pos = -1
 fsop_total_files_count = -1
 fsop_last_pos = -1
+# prebuilt so a progress line is a single %-format without any encoding at call time
+FSOP_PROGRESS_TEMPLATE = b'{"written": %d, "total": %d, "currentFilePos": %d, "totalFilesCount": %d}\n'
 def fs_progress_callback(written: int, total: int):
     global fsop_last_pos, fsop_current_file_pos
     if written == -1 and total == -1:
@@ -114,10 +114,13 @@ def fs_progress_callback(written: int, total: int):
     #if fsop_current_file_pos != -1 and fsop_total_files_count >= fsop_current_file_pos:
     #    payload["currentFilePos"] = fsop_current_file_pos
     #    payload["totalFilesCount"] = fsop_total_files_count
-    print(f"{{\"written\": {written}, \"total\": {total}, \"currentFilePos\": {fsop_current_file_pos}, \"totalFilesCount\": {fsop_total_files_count}}}", flush=True)
+    sys.stdout.buffer.write(FSOP_PROGRESS_TEMPLATE % (
+        written, total, fsop_current_file_pos, fsop_total_files_count))
+    sys.stdout.buffer.flush()
 
 
-if platform.system() == "Windows":
+# sys.platform instead of the platform module, which is slow to import
+if sys.platform == "win32":
     import msvcrt
 
     def clear_stdin():
@@ -125,31 +128,40 @@ if platform.system() == "Windows":
         while msvcrt.kbhit():
             msvcrt.getch()
 else:
-    import select
+    import selectors
+
+    # registered on the first clear_stdin call, not at import time as
+    # stdin may have no fd then (pythonw, captured stdin, --scan-ports)
+    stdin_selector: Optional[selectors.BaseSelector] = None
 
     def clear_stdin():
+        global stdin_selector
         stdin_fd = sys.stdin.fileno()
-        while select.select([stdin_fd], [], [], 0.0)[0]:
-            os.read(stdin_fd, 4096)
+        if stdin_selector is None:
+            # poll instead of epoll because epoll refuses regular files (stdin redirected from a file)
+            stdin_selector = selectors.PollSelector() if hasattr(selectors, "PollSelector") \
+                else selectors.SelectSelector()
+            stdin_selector.register(stdin_fd, selectors.EVENT_READ)
+        while stdin_selector.select(0):
+            # stop on EOF, otherwise stdin stays readable forever
+            if not os.read(stdin_fd, 4096):
+                break
 
 
-def listen_stdin(stop_event: threading.Event):
-    while not stop_event.is_set():
-        # readline is aceptable MicroPython does not
-        # support listening for single chars
-        data = sys.stdin.buffer.readline()
+def listen_stdin(stop_event: Optional[threading.Event]):
+    # readline is aceptable MicroPython does not
+    # support listening for single chars
+    # blocks until a line arrives, the parent answers the __SENTINEL__
+    # with a newline so this returns when the stop_event has been set
+    data = sys.stdin.buffer.readline()
 
-        # speed up return after __SENTINEL__ was sent
-        if stop_event.is_set():
-            return None
+    # speed up return after __SENTINEL__ was sent
+    if stop_event is not None and stop_event.is_set():
+        return None
 
-        if data:
-            data = data.strip()
-            if data != "":
-                return data+b"\r"
-
-        # reduce cpu load cause by stdin polling in this runtime thread
-        time.sleep(0.01)
+    if data:
+        return data.strip()+b"\r"
+    # EOF
     return b''
 ##################################
 ########## END Utils #############
@@ -167,9 +179,68 @@ class Wrapper:
         self.pyb = pyboard.Pyboard(
             device, baudrate, wait=5, exclusive=True
         )
+        # let the tty driver push received bytes immediately instead of
+        # waiting for the latency timer (16 ms on FTDI & co), Linux only
+        try:
+            self.pyb.serial.set_low_latency_mode(True)
+        except (AttributeError, ValueError):
+            # not a Linux serial port (e.g. telnet) or the driver does not support it
+            pass
+        if sys.platform == "win32":
+            # the default driver queues are only 4 KiB, let whole chunks pass at once
+            try:
+                self.pyb.serial.set_buffer_size(rx_size=65536, tx_size=65536)
+            except (AttributeError, SerialException):
+                pass
 
     def enter_raw_repl(self, soft_reset: bool = False):
         self.pyb.enter_raw_repl(soft_reset)
+        # a soft reset clears the globals of the REPL
+        if soft_reset:
+            self.load_helpers()
+
+    def load_helpers(self):
+        """Loads the __pico_ helper functions into the globals of the REPL.
+
+        If the blob fails (e.g. one helper does not compile on older firmware)
+        the helpers are loaded one by one so only the broken one is missing,
+        the load error is reported on stderr.
+        """
+        _, err = self.pyb.exec_raw(mpyFunctions.FC_HELPERS)
+        if not err:
+            return
+        for helper in mpyFunctions.FC_HELPER_SOURCES:
+            _, err = self.pyb.exec_raw(helper)
+            if err:
+                name = helper.split("def ", 1)[1].split("(", 1)[0]
+                sys.stderr.write("Failed to load helper " + name + ": "
+                                 + err.decode("utf-8", "replace") + "\n")
+                sys.stderr.flush()
+
+    def exec_helper(self, cmd: str, data_consumer=None) -> tuple[bytes, bytes]:
+        """Executes a command which calls one of the preloaded helper functions.
+
+        If the helpers got lost (e.g. user code did a soft reset) they are
+        reloaded and the command is executed again.
+
+        Args:
+            cmd (str): The command to execute.
+            data_consumer: Optional callback for the output of the command.
+
+        Returns:
+            tuple[bytes, bytes]: The normal and the error output.
+        """
+        ret, err = self.pyb.exec_raw(cmd, timeout=None, data_consumer=data_consumer)
+        if err and b"NameError" in err:
+            self.load_helpers()
+            ret, err = self.pyb.exec_raw(cmd, timeout=None, data_consumer=data_consumer)
+        return ret, err
+
+    def exec_helper_or_err(self, cmd: str):
+        """Same as exec_helper but streams the output to stdout and prints ERR on failure."""
+        _, err = self.exec_helper(cmd, pyboard.stdout_write_bytes)
+        if err:
+            sys.stdout.buffer.write(ERR_BYTES)
 
     def exit_raw_repl(self):
         self.pyb.exit_raw_repl()
@@ -184,9 +255,7 @@ class Wrapper:
         Args:
             target (str): The folder to list the files of.
         """
-        if target[0] != ":":
-            target = ":" + target
-        pyboard.filesystem_command(self.pyb, ["ls", target])
+        pyboard.filesystem_command(self.pyb, ["ls", sanitize_remote(target)])
 
     def list_contents_recursive(self, folder: str):
         """Lists all files in the given folder and subfolders.
@@ -194,7 +263,7 @@ class Wrapper:
         Args:
             folder (str): The path to the folder to list the files of.
         """
-        pyboard.filesystem_command(self.pyb, ["ls_recursive", folder])
+        self.exec_helper_or_err(mpyFunctions.CALL_LS_RECURSIVE(remote_path(folder)))
 
     def upload_files(self, local: list[str], remote: str = None, local_base_dir: str = None, verbose: bool = False):
         """Upload files to the Pico.
@@ -208,48 +277,42 @@ class Wrapper:
         if remote == None or remote == "":
             remote = ":"
 
-        """
-        Copy multiple files per directory:
-        files_by_dir = defaultdict(list)
-        for file_path in file_paths:
-            dir_path = os.path.dirname(file_path)
-            files_by_dir[dir_path].append(file_path)
-
-        for dir_path, files in files_by_dir.items():
-            if not os.path.exists(dir_path):
-                os.makedirs(dir_path)
-            custom_copy(files, dir_path)
-        """
         fsop_total_files_count = len(local)
 
         if local_base_dir != None:
-            # copy one by one; all files must be in a child directory of local_base_dir!!
-            # results in a list of tuples (local full path, relative to base dir path)
-            destinations: list[tuple[str, str]] = list(map(lambda x: (x, x.replace(
-                local_base_dir, "/").replace('\\', '/').replace("///", "/").replace("//", "/")), local.copy()))
-            destinations.sort(key=lambda x: x[1].count('/'))
-            for dest in destinations:
-                dir_path = os.path.dirname(dest[1])
-                # pyboard fs_mkdir has been modified so it don't cause any error if the directory already exists
-                # so that all errors thrown here will indicate to the parent that a file upload failed
-                self.mkdirs([dir_path])
-                # remate + dir_path and not remote+dest[1] because pyboard would even if only one file is uploaded
+            # all files must be in a child directory of local_base_dir!!
+            # group the local paths by their remote directory (relative to base dir)
+            # to copy multiple files per directory
+            files_by_dir: dict[str, list[str]] = defaultdict(list)
+            for x in local:
+                # relpath already normalizes the path, only the separators need converting
+                rel = "/" + os.path.relpath(x, local_base_dir).replace(os.sep, "/")
+                files_by_dir[rel.rpartition("/")[0] or "/"].append(x)
+
+            # pyboard fs_mkdir has been modified so it don't cause any error if the directory already exists
+            # so that all errors thrown here will indicate to the parent that a file upload failed
+            self.mkdirs(list(files_by_dir))
+
+            fsop_current_file_pos = 0
+            # shallow directories first
+            for dir_path in sorted(files_by_dir, key=lambda d: d.count('/')):
+                srcs = files_by_dir[dir_path]
+                # remote + dir_path and not remote+dest because pyboard would even if only one file is uploaded
                 # treat remote as directory and not as a target file name if it ends with a slash
                 # remote + dir_path because dir_path is relative to the remote path
                 if verbose:
-                    fsop_current_file_pos = destinations.index(dest) + 1
                     pyboard.filesystem_command(
-                        self.pyb, ["cp", dest[0], remote+dir_path+"/"],
-                        progress_callback=fs_progress_callback)
+                        self.pyb, ["cp", *srcs, remote+dir_path+"/"],
+                        progress_callback=fs_progress_callback, auto_pos_incr=True)
                 else:
                     pyboard.filesystem_command(
-                        self.pyb, ["cp", dest[0], remote+dir_path+"/"])
+                        self.pyb, ["cp", *srcs, remote+dir_path+"/"])
         else:
             if verbose:
                 pyboard.filesystem_command(
-                    self.pyb, ["cp"]+local+[remote], progress_callback=fs_progress_callback, auto_pos_incr=True)
+                    self.pyb, ["cp", *local, remote], progress_callback=fs_progress_callback, auto_pos_incr=True)
             else:
-                pyboard.filesystem_command(self.pyb, ["cp"]+local+[remote])
+                pyboard.filesystem_command(self.pyb, ["cp", *local, remote])
         fsop_total_files_count = -1
         fsop_current_file_pos = -1
         fsop_last_pos = -1
@@ -278,26 +341,24 @@ class Wrapper:
 
             # Group files by folder
             for file_path in remote:
-                folder_path, _ = file_path.rsplit('/', 1)
-                folder_files[folder_path].append(file_path)
+                folder_files[file_path.rpartition('/')[0]].append(file_path)
 
             fsop_current_file_pos = 0
             # Call pyboard.filesystem_command for each folder and its files
             for folder_path, files in folder_files.items():
                 # if local is a directory, add a slash to the end, because see above
-                target = os.path.join(local, folder_path.lstrip(
-                    ':').lstrip('/'))+os.path.sep
+                target = os.path.join(local, folder_path.lstrip(':/'))+os.path.sep
                 if verbose:
                     pyboard.filesystem_command(
-                        self.pyb, ["cp"] + files + [target], progress_callback=fs_progress_callback, auto_pos_incr=True)
+                        self.pyb, ["cp", *files, target], progress_callback=fs_progress_callback, auto_pos_incr=True)
                 else:
-                    pyboard.filesystem_command(self.pyb, ["cp"] + files + [target])
+                    pyboard.filesystem_command(self.pyb, ["cp", *files, target])
         else:
             if verbose:
                 pyboard.filesystem_command(
-                    self.pyb, ["cp"]+remote+[local], progress_callback=fs_progress_callback, auto_pos_incr=True)
+                    self.pyb, ["cp", *remote, local], progress_callback=fs_progress_callback, auto_pos_incr=True)
             else:
-                pyboard.filesystem_command(self.pyb, ["cp"]+remote+[local])
+                pyboard.filesystem_command(self.pyb, ["cp", *remote, local])
         fsop_total_files_count = -1
         fsop_current_file_pos = -1
         fsop_last_pos = -1
@@ -308,9 +369,10 @@ class Wrapper:
         Args:
             files (list[str]): The remote path(s) to the file(s) to delete
         """
-        # call rm for each file
-        for file in files:
-            pyboard.filesystem_command(self.pyb, ["rm", file])
+        if not files:
+            return
+        # remove all files in one exec instead of one rm per file
+        self.exec_helper_or_err(mpyFunctions.CALL_RM_FILES([remote_path(f) for f in files]))
 
     def mkdirs(self, folders: list[str]):
         """Creates (a) folder(s) on the pico.
@@ -318,10 +380,11 @@ class Wrapper:
         Args:
             folders (list[str]): The path to the folder(s) to create on the remote host.
         """
-        # call mkdir for each folder
         folders = prepend_parent_directories(folders)
-        for folder in folders:
-            pyboard.filesystem_command(self.pyb, ["mkdir", folder])
+        if not folders:
+            return
+        # create all folders (parents first) in one exec instead of one mkdir per folder
+        self.exec_helper_or_err(mpyFunctions.CALL_MKDIRS(folders))
 
     def rmdirs(self, folders: list[str]):
         """Removes (a) folder(s) on the pico.
@@ -329,9 +392,10 @@ class Wrapper:
         Args:
             folders (list[str]): The path to the folder(s) to remove on the remote host.
         """
-        # call rmdir for each folder
-        for folder in folders:
-            pyboard.filesystem_command(self.pyb, ["rmdir", folder])
+        if not folders:
+            return
+        # remove all folders in one exec instead of one rmdir per folder
+        self.exec_helper_or_err(mpyFunctions.CALL_RMDIRS([remote_path(f) for f in folders]))
 
     def rmdir_recursive(self, folder: str):
         """Removes a folder on the pyboard recursively.
@@ -347,24 +411,8 @@ class Wrapper:
         Args:
             path (str): The path to the file or folder to remove on the remote host.
         """
-        # load function into memory
-        self.pyb.exec_raw(mpyFunctions.FC_IS_DIR)
-
-        ret, err = self.pyb.exec_raw(f"print('D' if {mpyFunctions.CALL_IS_DIR(path)} else 'F')")
-        if err:
-            print(ERR, flush=True)
-        else:
-            is_dir = ret.decode().strip() == 'D'
-            if is_dir:
-                if recursive:
-                    pyboard.filesystem_command(self.pyb, ["rmdir_recursive", path])
-                else:
-                    pyboard.filesystem_command(self.pyb, ["rmdir", path])
-            else:
-                pyboard.filesystem_command(self.pyb, ["rm", path])
-
-        # clear memory
-        self.pyb.exec_raw(mpyFunctions.DEL_IS_DIR)
+        # stat and remove on the device in a single exec
+        self.exec_helper_or_err(mpyFunctions.CALL_RM_ITEM(remote_path(path), recursive))
 
     def calc_file_hashes(self, files: list[str]):
         """Calculates the hashes of (a) file(s) on the pico.
@@ -372,12 +420,10 @@ class Wrapper:
         Args:
             files (list[str]): The path to the file(s) to calculate the hash of.
         """
-        # load function in ram on the pyboard
-        self.exec_cmd(mpyFunctions.FC_HASH_FILE, False)
-        # call function for each file
-        for file in files:
-            self.exec_cmd(mpyFunctions.CALL_HASH_FILE(file))
-        self.exec_cmd(mpyFunctions.DEL_HASH_FILE)
+        if not files:
+            return
+        # call function for all files at once (one JSON line per file is printed)
+        self.exec_helper_or_err(mpyFunctions.CALL_HASH_FILES(files))
 
     def rename_item(self, old: str, new: str):
         """Renames a file / folder on the Pico (W).
@@ -386,9 +432,7 @@ class Wrapper:
             old (str): The old/current path to the file / folder.
             new (str): The new/target path to the file / folder.
         """
-        self.exec_cmd(mpyFunctions.FC_RENAME_ITEM)
-        self.exec_cmd(mpyFunctions.CALL_RENAME_ITEM(old, new))
-        self.exec_cmd(mpyFunctions.DEL_RENAME_ITEM)
+        self.exec_helper_or_err(mpyFunctions.CALL_RENAME_ITEM(old, new))
 
     def get_item_stat(self, item: str):
         """Gets the stat of (a) file(s) on the pico.
@@ -396,9 +440,7 @@ class Wrapper:
         Args:
             items (list[str]): The path to the file(s) to get the stat of.
         """
-        self.exec_cmd(mpyFunctions.FC_GET_FILE_INFO)
-        self.exec_cmd(mpyFunctions.CALL_GET_FILE_INFO(item))
-        self.exec_cmd(mpyFunctions.DEL_GET_FILE_INFO)
+        self.exec_helper_or_err(mpyFunctions.CALL_GET_FILE_INFO(item))
 
     def exec_cmd(self, cmd: Union[str, bytes], follow: Optional[bool] = None, full_output: bool = False):
         """Executes a command on the pyboard.
@@ -421,9 +463,9 @@ class Wrapper:
             # pyboard.stdout_write_bytes(ret_err)
             # sys.exit(1)
             if full_output:
-                print(ret_err.decode("utf-8"), flush=True)
+                sys.stdout.buffer.write(ret_err + b"\n")
             else:
-                print(ERR, flush=True)
+                sys.stdout.buffer.write(ERR_BYTES)
 
     def exec_friendly_cmd(self, cmd: Union[str, bytes]):
         """Executes a command on the pyboard.
@@ -449,7 +491,7 @@ class Wrapper:
         sys.stdout.flush()
         stdio_thread.join()
         if err:
-            print(err.decode("utf-8"), flush=True)
+            sys.stdout.buffer.write(err + b"\n")
 
     def run_file(self, filename: str):
         """Runs a file on the pyboard.
@@ -466,22 +508,22 @@ class Wrapper:
                 self.exec_friendly_cmd(pyfile)
 
         except:
-            print(ERR, flush=True)
+            sys.stdout.buffer.write(ERR_BYTES)
 
     def sync_rtc(self):
         """Syncs the RTC on the pyboard with the PC's RTC."""
         # exec without data_consumer, also to set it as fast as possible
         _, err = self.pyb.exec_raw("\r"+mpyFunctions.EXEC_SYNC_RTC(datetime.now()))
         if err:
-            print(ERR, flush=True)
+            sys.stdout.buffer.write(ERR_BYTES)
 
     def get_rtc_time(self):
         """Gets the RTC time on the pyboard."""
         ret, err = self.pyb.exec_raw("\r"+mpyFunctions.EXEC_GET_RTC_TIME)
         if err:
-            print(ERR, flush=True)
+            sys.stdout.buffer.write(ERR_BYTES)
         else:
-            print(ret.decode("utf-8"), flush=True)
+            sys.stdout.buffer.write(ret + b"\n")
 
     def reboot(self, verbose: bool = False):
         """
@@ -505,7 +547,7 @@ class Wrapper:
         """
         self.stop_running_stuff()
         self.pyb.exit_raw_repl()
-        self.pyb.enter_raw_repl(True)
+        self.enter_raw_repl(True)
         time.sleep(0.1)
 
     def ctrl_d(self):
@@ -535,36 +577,38 @@ class Wrapper:
 
     def retrieve_tab_completion(self, line: str):
         cmd_bin = line.encode("utf-8")
-        wrapper.pyb.serial.write(b"\x02")
-        wrapper.pyb.serial.flush()
-        # normally friendly repl prompt needs about 0.00007s to arrive (at worst)
-        time.sleep(0.002)
-        # throw friendly REPL prompt in the void
-        wrapper.pyb.serial.reset_input_buffer()
-        # send cmd
-        wrapper.pyb.serial.write(cmd_bin)
+        cmd_len = len(cmd_bin)
+        ser = wrapper.pyb.serial
         # reconfigure serial port timeout (and store current timeout value)
         # timeout needed because otherwise read_until() will block forever (if no tab-completion is available)
-        prev_timeout = wrapper.pyb.serial.timeout
-        wrapper.pyb.serial.timeout = 0.1
+        prev_timeout = ser.timeout
+        ser.timeout = 0.1
+        ser.write(b"\x02")
+        ser.flush()
+        # wait for the friendly REPL prompt instead of sleeping a fixed time
+        # and throw it (and anything left over) in the void
+        ser.read_until(expected=b">>> ")
+        ser.reset_input_buffer()
+        # send cmd
+        ser.write(cmd_bin)
         # send tab command
-        wrapper.pyb.serial.write(b"\t")
+        ser.write(b"\t")
         # read until first newline (if its a simple autocompletion it will wait for the timeout)
-        val = wrapper.pyb.serial.read_until(expected=b"\r\n")
+        val = ser.read_until(expected=b"\r\n")
         # +2 for newline and carriage return expected above | if no completion avail
         # it will be returned as mutliline
-        if len(val) > len(cmd_bin)+2:
+        if len(val) > cmd_len+2:
             # > simple tab-completion available
-            sys.stdout.write(SIMPLE_AUTO_COMP+val.decode("utf-8")+"\n")
+            sys.stdout.buffer.write(SIMPLE_AUTO_COMP_BYTES + val + b"\n")
         else:
             # > multiline tab-completion available
-            sys.stdout.write(wrapper.pyb.serial.read_until(expected=cmd_bin)[:-len(cmd_bin)-4].decode("utf-8"))
+            sys.stdout.buffer.write(ser.read_until(expected=cmd_bin)[:-cmd_len-4])
         # clear line so enter_raw_repl() will work
-        wrapper.pyb.serial.write(b"\x03")
+        ser.write(b"\x03")
         # put REPl back into raw mode
         wrapper.enter_raw_repl(False)
         # restore previous timeout
-        wrapper.pyb.serial.timeout = prev_timeout
+        ser.timeout = prev_timeout
 
     def listen_until_friendly_prompt(self, timeout: float = 2):
         received_data = ""
@@ -609,29 +653,50 @@ class Wrapper:
 
 
 # Define the serial port reading function
-def read_serial_port(stop_event: threading.Event):
-    while not stop_event.is_set():
-        try:
-            n = wrapper.pyb.serial.inWaiting()
-        except OSError as er:
-            if er.args[0] == 5:  # IO error, device disappeared
-                print("device disconnected")
-                break
+# bytes passed through to the console as is, everything else is shown as [xx]
+SERIAL_PASSTHROUGH = bytes((8, 9, 10, 13, 27)) + bytes(range(32, 127))
+SERIAL_ESCAPES: list[bytes] = [
+    bytes((i,)) if i in SERIAL_PASSTHROUGH else b"[%02x]" % i for i in range(256)
+]
+
 
-        if n > 0:
-            c = wrapper.pyb.serial.read(1)
-            if c is not None:
-                # pass character through to the console
-                oc = ord(c)
-                if oc in (8, 9, 10, 13, 27) or 32 <= oc <= 126:
-                    sys.stdout.write(c.decode("utf-8"))
-                    sys.stdout.flush()
+def read_serial_port(stop_event: threading.Event):
+    ser = wrapper.pyb.serial
+    # only pyserial ports have a read timeout, telnet and exec: devices
+    # are polled as read() on them blocks until a byte arrives
+    blocking = isinstance(ser, Serial)
+    if blocking:
+        # block for the first byte but wake up regularly to check the stop_event
+        prev_timeout = ser.timeout
+        ser.timeout = 0.1
+    try:
+        while not stop_event.is_set():
+            try:
+                # read everything that is available at once instead of byte by byte
+                if blocking:
+                    data = ser.read(ser.inWaiting() or 1)
                 else:
-                    sys.stdout.write((b"[%02x]" % ord(c)).decode("utf-8"))
-                    sys.stdout.flush()
+                    n = ser.inWaiting()
+                    data = ser.read(n) if n else b""
+            except OSError as er:
+                if er.args[0] == 5:  # IO error, device disappeared
+                    print("device disconnected")
+                    break
+                continue
 
-        # Add a small delay to reduce CPU usage
-        time.sleep(0.01)
+            if data:
+                # pass characters through to the console, only escape
+                # byte by byte if the chunk contains non-printables
+                if data.translate(None, SERIAL_PASSTHROUGH):
+                    data = b"".join([SERIAL_ESCAPES[oc] for oc in data])
+                sys.stdout.buffer.write(data)
+                sys.stdout.buffer.flush()
+            elif not blocking:
+                # idle, don't spin but still react to the stop_event quickly
+                stop_event.wait(0.01)
+    finally:
+        if blocking:
+            ser.timeout = prev_timeout
 
 
 def redirect_stdin(stop_event: threading.Event, wrapper: Wrapper):
@@ -648,12 +713,278 @@ def redirect_stdin(stop_event: threading.Event, wrapper: Wrapper):
         elif c:  # Only write to the serial port if there is data available
             if wrapper.pyb.serial.is_open:
                 wrapper.pyb.serial.write(c)
+        else:
+            # EOF, readline would return immediately from now on
+            break
+
+
+##################################
+####### BEGIN Command handlers ###
+##################################
+
+# each handler is called with the wrapper and the args of the command;
+# the args listed in COMMAND_REQUIRED_ARGS are checked by run_command beforehand
+
+
+def handle_exit(wrapper: Wrapper, args: dict):
+    wrapper.pyb.close()
+    exit(0)
+
+
+def handle_status(wrapper: Wrapper, args: dict):
+    # not connection this will rais a serial exception
+    wrapper.pyb.exec_raw(b"print('OK')", 5)
+
+
+def handle_sync_rtc(wrapper: Wrapper, args: dict):
+    wrapper.sync_rtc()
+
+
+def handle_get_rtc_time(wrapper: Wrapper, args: dict):
+    wrapper.get_rtc_time()
+
+
+def handle_soft_reset(wrapper: Wrapper, args: dict):
+    wrapper.soft_reset()
+
+
+def handle_ctrl_d(wrapper: Wrapper, args: dict):
+    wrapper.ctrl_d()
+
+
+def handle_hard_reset(wrapper: Wrapper, args: dict):
+    if args.get("verbose"):
+        wrapper.reboot(verbose=True)
+    wrapper.reboot()
 
-        # Add a small delay to reduce CPU usage
-        time.sleep(0.01)
+
+def handle_command(wrapper: Wrapper, args: dict):
+    # [5:] to remove the ".cmd " from the start of the string
+    if args.get("interactive"):
+        wrapper.exec_friendly_cmd(args["command"].encode("utf-8"))
+        clear_stdin()
+    else:
+        wrapper.exec_cmd(args["command"])
+
+
+def handle_friendly_code(wrapper: Wrapper, args: dict):
+    wrapper.exec_friendly_cmd(args["code"])
+    # clear full stdin buffer
+    clear_stdin()
+
+
+def handle_retrieve_tab_comp(wrapper: Wrapper, args: dict):
+    wrapper.retrieve_tab_completion(args["code"])
+
+
+def handle_run_file(wrapper: Wrapper, args: dict):
+    wrapper.run_file(args["files"][0])
+    # clear full stdin buffer
+    clear_stdin()
+
+
+def handle_double_ctrlc(wrapper: Wrapper, args: dict):
+    wrapper.stop_running_stuff()
+
+
+def handle_list_contents(wrapper: Wrapper, args: dict):
+    wrapper.list_contents(args["target"])
+
+
+def handle_list_contents_recursive(wrapper: Wrapper, args: dict):
+    wrapper.list_contents_recursive(args["target"])
+
+
+#################################
+## Download files with pyboard ##
+#################################
+def handle_download_files(wrapper: Wrapper, args: dict):
+    verbose = args.get("verbose") == True
+    if len(args["files"]) == 1:
+        wrapper.download_files(
+            [sanitize_remote(args["files"][0])], args["local"], verbose)
+    else:
+        # if more files in the list, the local path is the folder to save the files to and join the files with spaces
+        # [sanitize_remote(f) for f in args["files"]] is a bit slower thant sanitize_remote_v2(args["files"])
+        wrapper.download_files(sanitize_remote_v2(
+            args["files"]), args["local"], verbose)
+
+
+#################################
+### Upload files with pyboard ###
+#################################
+def handle_upload_files(wrapper: Wrapper, args: dict):
+    verbose = args.get("verbose") == True
+    wrapper.upload_files(args["files"], sanitize_remote(
+        args["remote"]), args.get("local_base_dir"), verbose=verbose)
+
+
+#################################
+### Delete files with pyboard ###
+#################################
+def handle_delete_files(wrapper: Wrapper, args: dict):
+    # no need to sanitize the files paths as they don't require to be prefixed
+    # because the operation does only accept files on remote host
+    wrapper.delete_files(args["files"])
+
+
+#################################
+### Create folder with pyboard ###
+#################################
+def handle_mkdirs(wrapper: Wrapper, args: dict):
+    # no need to sanitize the folders paths as they don't require to be prefixed
+    # because the operation does only accept folders on remote host
+    wrapper.mkdirs(args["folders"])
+
+
+###################################
+### Remove folders with pyboard ###
+###################################
+def handle_rmdirs(wrapper: Wrapper, args: dict):
+    # no need to sanitize the folders paths as they don't require to be prefixed
+    # because the operation does only accept folders on remote host
+    wrapper.rmdirs(args["folders"])
+
+
+##############################################
+### Remove folder recursively with pyboard ###
+##############################################
+def handle_rmtree(wrapper: Wrapper, args: dict):
+    wrapper.rmdir_recursive(args["folders"][0])
+
+
+####################################################
+# Remove file or folder (recursively) with pyboard #
+####################################################
+def handle_rm_file_or_dir(wrapper: Wrapper, args: dict):
+    recursive = args.get("recursive") == True
+    wrapper.rm_file_or_dir(args["target"], recursive)
+
+
+##############################################
+######## Get file hashes with pyboard ########
+##############################################
+def handle_calc_file_hashes(wrapper: Wrapper, args: dict):
+    wrapper.calc_file_hashes(args["files"])
+
+
+def handle_rename(wrapper: Wrapper, args: dict):
+    wrapper.rename_item(args["item"], args["target"])
+
+
+def handle_get_item_stat(wrapper: Wrapper, args: dict):
+    wrapper.get_item_stat(args["item"])
+
+
+def handle_get_friendly(wrapper: Wrapper, args: dict):
+    wrapper.friendly = True
+    wrapper.pyb.exit_raw_repl()
+
+
+#########################################################
+# Run multiple commands with a single EOO at the end ####
+#########################################################
+def handle_batch(wrapper: Wrapper, args: dict):
+    operations = args["operations"]
+    if not isinstance(operations, list):
+        sys.stdout.buffer.write(UNKNOWN_COMMAND_BYTES)
+        return
+    for operation in operations:
+        # malformed entries are treated like unknown commands instead of raising
+        if not isinstance(operation, dict) or operation.get("command") == "batch" \
+                or not run_command(wrapper, operation.get("command"), operation.get("args", {})):
+            sys.stdout.buffer.write(UNKNOWN_COMMAND_BYTES)
+        # the remaining operations would run in the friendly REPL
+        if wrapper.friendly:
+            break
+
+
+# O(1) dispatch instead of comparing the command against every name
+COMMAND_HANDLERS = {
+    "exit": handle_exit,
+    "status": handle_status,
+    "sync_rtc": handle_sync_rtc,
+    "get_rtc_time": handle_get_rtc_time,
+    "soft_reset": handle_soft_reset,
+    "ctrl_d": handle_ctrl_d,
+    "hard_reset": handle_hard_reset,
+    "command": handle_command,
+    "friendly_code": handle_friendly_code,
+    "retrieve_tab_comp": handle_retrieve_tab_comp,
+    "run_file": handle_run_file,
+    "double_ctrlc": handle_double_ctrlc,
+    "list_contents": handle_list_contents,
+    "list_contents_recursive": handle_list_contents_recursive,
+    "download_files": handle_download_files,
+    "upload_files": handle_upload_files,
+    "delete_files": handle_delete_files,
+    "mkdirs": handle_mkdirs,
+    "rmdirs": handle_rmdirs,
+    "rmtree": handle_rmtree,
+    "rm_file_or_dir": handle_rm_file_or_dir,
+    "calc_file_hashes": handle_calc_file_hashes,
+    "rename": handle_rename,
+    "get_item_stat": handle_get_item_stat,
+    "get_friendly": handle_get_friendly,
+    "batch": handle_batch,
+}
+# args every command needs, checked once before its handler is called
+COMMAND_REQUIRED_ARGS: dict[str, tuple[str, ...]] = {
+    "command": ("command",),
+    "friendly_code": ("code",),
+    "retrieve_tab_comp": ("code",),
+    "run_file": ("files",),
+    "list_contents": ("target",),
+    "list_contents_recursive": ("target",),
+    "download_files": ("files", "local"),
+    "upload_files": ("files", "remote"),
+    "delete_files": ("files",),
+    "mkdirs": ("folders",),
+    "rmdirs": ("folders",),
+    "rmtree": ("folders",),
+    "rm_file_or_dir": ("target",),
+    "calc_file_hashes": ("files",),
+    "rename": ("item", "target"),
+    "get_item_stat": ("item",),
+    "batch": ("operations",),
+}
+
+
+def run_command(wrapper: Wrapper, command: str, args: dict) -> bool:
+    """Runs the handler of a command.
+
+    Returns:
+        bool: False if the command is unknown or misses required args.
+    """
+    # malformed json (e.g. a list as command or a string as args) counts as unknown
+    if not isinstance(command, str) or not isinstance(args, dict):
+        return False
+    handler = COMMAND_HANDLERS.get(command)
+    if handler is None:
+        return False
+    for key in COMMAND_REQUIRED_ARGS.get(command, ()):
+        if key not in args:
+            return False
+    handler(wrapper, args)
+    return True
+
+
+# status pings are sent often, their exact lines skip the json parser
+STATUS_COMMAND = {"command": "status", "args": {}}
+STATUS_COMMAND_LINES = frozenset((
+    b'{"command":"status","args":{}}\n',
+    b'{"command":"status"}\n',
+))
+##################################
+####### END Command handlers #####
+##################################
 
 
 if __name__ == "__main__":
+    # the parent reads line by line, so flush each complete line
+    # instead of passing flush=True to every print
+    sys.stdout.reconfigure(line_buffering=True)
+
     # accept port as argument for -p <port> and default to COM3
     import argparse
 
@@ -703,7 +1034,8 @@ if __name__ == "__main__":
             # print all at once so that when there are
             # many ports the parent don't have to buffer until it
             # has received EOO
-            print("\n".join(ports)+"\n"+EOO, flush=True)
+            sys.stdout.buffer.write("".join([port + "\n" for port in ports]).encode("utf-8") + EOO_BYTES)
+            sys.stdout.buffer.flush()
 
             # exit the script after printing the ports to stdout
             exit(0)
@@ -711,6 +1043,14 @@ if __name__ == "__main__":
         if args.device == "default":
             sys.exit(0x12F9)
 
+        # imported only now as --scan-ports does not need it
+        # and orjson pulls in uuid, zoneinfo & co. at import time
+        try:
+            # optional, parses the command stream faster than the json module
+            from orjson import loads as json_loads
+        except ImportError:
+            from json import loads as json_loads
+
         if args.delay:
             time.sleep(float(args.delay))
 
@@ -727,7 +1067,9 @@ if __name__ == "__main__":
             wrapper.listen_until_friendly_prompt(timeout=-1)
             stop_event.set()
             stdio_thread.join()
-            print(EOO, flush=True)
+            sys.stdout.flush()
+            sys.stdout.buffer.write(EOO_BYTES)
+            sys.stdout.buffer.flush()
 
 
         # enter raw repl (better for programmatic use, aka bot chating with bot)
@@ -756,17 +1098,15 @@ if __name__ == "__main__":
                 serial_thread.start()
 
                 while True:
+                    # blocks until a line arrives, so no need to sleep here
                     c = listen_stdin(None)
-                    if c == b"\x1d":  # ctrl-], quit
+                    if c == b"\x1d" or not c:  # ctrl-] or EOF, quit
                         break
                     elif c == "\x04":  # ctrl-D, end of file
                         pass
                     else:
                         wrapper.pyb.serial.write(c)
 
-                    # Add a small delay to reduce CPU usage
-                    time.sleep(0.01)
-
                 # Signal the thread to stop and wait for it to terminate
                 stop_event.set()
                 serial_thread.join()
@@ -782,160 +1122,33 @@ if __name__ == "__main__":
                 # TODO: raw repl entry will print to user and cause a JSONDecodeError
                 wrapper.pyb.enter_raw_repl(False)
 
-            line = input()
+            # read raw bytes, the json parser does not need them decoded
+            line = sys.stdin.buffer.readline()
+            if not line:
+                raise EOFError
 
-            # check if input is json and if so, parse it
-            try:
-                line = json.loads(line)
-            except json.decoder.JSONDecodeError:
-                print("!!JSONDecodeError!!", flush=True)
-                continue
+            if line in STATUS_COMMAND_LINES:
+                line = STATUS_COMMAND
+            else:
+                # check if input is json and if so, parse it
+                try:
+                    line = json_loads(line)
+                # orjson.JSONDecodeError and json.JSONDecodeError are both ValueErrors
+                except ValueError:
+                    sys.stdout.buffer.write(JSON_DECODE_ERROR_BYTES)
+                    sys.stdout.buffer.flush()
+                    continue
 
             if "command" not in line:
                 continue
 
-            if line["command"] == "exit":
-                wrapper.pyb.close()
-                exit(0)
-
-            elif line["command"] == "status":
-                # not connection this will rais a serial exception
-                wrapper.pyb.exec_raw("print('OK')".encode("utf-8"), 5)
-
-            elif line["command"] == "sync_rtc":
-                wrapper.sync_rtc()
-
-            elif line["command"] == "get_rtc_time":
-                wrapper.get_rtc_time()
-
-            elif line["command"] == "soft_reset":
-                wrapper.soft_reset()
-
-            elif line["command"] == "ctrl_d":
-                wrapper.ctrl_d()
-
-            elif line["command"] == "hard_reset":
-                if "verbose" in line["args"] and line["args"]["verbose"]:
-                    wrapper.reboot(verbose=True)
-                wrapper.reboot()
-
-            elif line["command"] == "command" and "command" in line["args"]:
-                # [5:] to remove the ".cmd " from the start of the string
-                interactive = "interactive" in line["args"] and line["args"]["interactive"]
-                if interactive:
-                    wrapper.exec_friendly_cmd(line["args"]["command"].encode("utf-8"))
-                    clear_stdin()
-                else:
-                    wrapper.exec_cmd(line["args"]["command"])
-
-            elif line["command"] == "friendly_code" and "code" in line["args"]:
-                wrapper.exec_friendly_cmd(line["args"]["code"])
-                # clear full stdin buffer
-                clear_stdin()
-
-            elif line["command"] == "retrieve_tab_comp" and "code" in line["args"]:
-                wrapper.retrieve_tab_completion(line["args"]["code"])
-
-            elif line["command"] == "run_file" and "files" in line["args"]:
-                wrapper.run_file(line["args"]["files"][0])
-                # clear full stdin buffer
-                clear_stdin()
-
-            elif line["command"] == "double_ctrlc":
-                wrapper.stop_running_stuff()
-
-            elif line["command"] == "list_contents" and "target" in line["args"]:
-                wrapper.list_contents(line["args"]["target"])
-
-            elif line["command"] == "list_contents_recursive" and "target" in line["args"]:
-                wrapper.list_contents_recursive(line["args"]["target"])
-
-            #################################
-            ## Download files with pyboard ##
-            #################################
-            elif line["command"] == "download_files" and "files" in line["args"] \
-                    and "local" in line["args"]:
-                verbose = "verbose" in line["args"] and line["args"]["verbose"] == True
-                if len(line["args"]["files"]) == 1:
-                    wrapper.download_files(
-                        [sanitize_remote(line["args"]["files"][0])], line["args"]["local"], verbose)
-                else:
-                    # if more files in the list, the local path is the folder to save the files to and join the files with spaces
-                    # [sanitize_remote(f) for f in line["args"]["files"]] is a bit slower thant sanitize_remote_v2(line["args"]["files"])
-                    wrapper.download_files(sanitize_remote_v2(
-                        line["args"]["files"]), line["args"]["local"], verbose)
-
-            #################################
-            ### Upload files with pyboard ###
-            #################################
-            elif line["command"] == "upload_files" and "files" in line["args"] \
-                    and "remote" in line["args"]:
-                verbose = "verbose" in line["args"] and line["args"]["verbose"] == True
-                if "local_base_dir" in line["args"]:
-                    wrapper.upload_files(line["args"]["files"], sanitize_remote(
-                        line["args"]["remote"]), line["args"]["local_base_dir"], verbose=verbose)
-                else:
-                    wrapper.upload_files(line["args"]["files"],
-                                         sanitize_remote(line["args"]["remote"]), verbose=verbose)
-
-            #################################
-            ### Delete files with pyboard ###
-            #################################
-            elif line["command"] == "delete_files" and "files" in line["args"]:
-                # no need to sanitize the files paths as they don't require to be prefixed
-                # because the operation does only accept files on remote host
-                wrapper.delete_files(line["args"]["files"])
-
-            #################################
-            ### Create folder with pyboard ###
-            #################################
-            elif line["command"] == "mkdirs" and "folders" in line["args"]:
-                # no need to sanitize the folders paths as they don't require to be prefixed
-                # because the operation does only accept folders on remote host
-                wrapper.mkdirs(line["args"]["folders"])
-
-            ###################################
-            ### Remove folders with pyboard ###
-            ###################################
-            elif line["command"] == "rmdirs" and "folders" in line["args"]:
-                # no need to sanitize the folders paths as they don't require to be prefixed
-                # because the operation does only accept folders on remote host
-                wrapper.rmdirs(line["args"]["folders"])
-
-            ##############################################
-            ### Remove folder recursively with pyboard ###
-            ##############################################
-            elif line["command"] == "rmtree" and "folders" in line["args"]:
-                wrapper.rmdir_recursive(line["args"]["folders"][0])
-
-            ####################################################
-            # Remove file or folder (recursively) with pyboard #
-            ####################################################
-            elif line["command"] == "rm_file_or_dir" and "target" in line["args"]:
-                recursive = "recursive" in line["args"] and line["args"]["recursive"] == True
-                wrapper.rm_file_or_dir(line["args"]["target"], recursive)
-
-            ##############################################
-            ######## Get file hashes with pyboard ########
-            ##############################################
-            elif line["command"] == "calc_file_hashes" and "files" in line["args"]:
-                wrapper.calc_file_hashes(line["args"]["files"])
-
-            elif line["command"] == "rename" and "item" in line["args"] and "target" in line["args"]:
-                wrapper.rename_item(line["args"]["item"], line["args"]["target"])
-
-            elif line["command"] == "get_item_stat" and "item" in line["args"]:
-                wrapper.get_item_stat(line["args"]["item"])
-
-            elif line["command"] == "get_friendly":
-                wrapper.friendly = True
-                wrapper.pyb.exit_raw_repl()
-
-            else:
-                print("!!Unknown command!!", flush=True)
+            if not run_command(wrapper, line["command"], line.get("args", {})):
+                sys.stdout.buffer.write(UNKNOWN_COMMAND_BYTES)
 
+            # text layer first, then EOO (and any ERR written before) in one flush
             sys.stdout.flush()
-            print(EOO, flush=True)
+            sys.stdout.buffer.write(EOO_BYTES)
+            sys.stdout.buffer.flush()
 
     except pyboard.PyboardError as er:
         print("!!PyboardError!!")
@@ -1,22 +1,14 @@
 import timeit
 
 def sanitize_remote_v1(file: str | None) -> str:
-    if file == "" or file == None:
+    if not file:
         return ":" # root
-    elif file[0] != ":":
+    elif not file.startswith(":"):
         return ":" + file
     return file
 
 def sanitize_remote_v2(files: list[str | None]) -> list[str]:
-    result = []
-    for file in files:
-        if file == "" or file == None:
-            result.append(":") # root
-        elif file[0] != ":":
-            result.append(":" + file)
-        else:
-            result.append(file)
-    return result
+    return [":" if not file else (file if file.startswith(":") else ":" + file) for file in files]
 
 files = ["file1.txt", "file2.txt"] * 1000
 